@@ -0,0 +1,23 @@
+# Production server for TruthFort: gunicorn -c gunicorn.conf.py main:app
+import os
+
+# One BLAS/OpenMP thread per request thread, so workers * threads don't oversubscribe cores.
+# Set before the app (and numpy) is preloaded.
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+# main.py uses paths relative to its own directory
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = '0.0.0.0:8000'
+
+# Load the app once in the master so workers share it copy-on-write
+preload_app = True
+workers = int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 1))
+worker_class = 'gthread'
+threads = 8
+timeout = 30
+
+def when_ready(server):
+    from main import reset_daily_usage, db_pool
+    reset_daily_usage()
+    # SQLite connections must not be carried across fork(); workers open their own
+    db_pool.close_all()
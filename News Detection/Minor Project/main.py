@@ -1,20 +1,66 @@
 from flask import Flask, request, render_template_string, jsonify, send_from_directory
 from flask_cors import CORS
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import nltk
+import numpy as np
 import sqlite3
+import atexit
+import weakref
 import hashlib
+import hmac
+import functools
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
 from env import NEWS_API_KEY
 import re
 import os
 import traceback
 
+# orjson parses the NewsAPI payload several times faster when it is installed
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 app = Flask(__name__, static_folder='.')
 
+# NewsAPI results are reused for identical queries within this window
+ARTICLE_CACHE_TTL = timedelta(minutes=10)
+# Articles requested per NewsAPI call; lower it to trade recall for a smaller payload
+try:
+    NEWS_PAGE_SIZE = max(1, min(100, int(os.getenv('NEWS_PAGE_SIZE', '100'))))
+except ValueError:
+    NEWS_PAGE_SIZE = 100
+# Hot queries are also kept in memory in front of the SQLite cache
+ARTICLE_CACHE_SIZE = 512
+# Verification results are kept in memory for the same window
+RESULT_CACHE_SIZE = 4096
+# Browser cache lifetime for the static landing and app pages (seconds)
+STATIC_MAX_AGE = 3600
+# Memoized password hashes keep cleartext passwords in process memory, so it's opt-in
+try:
+    HASH_CACHE_SIZE = max(0, int(os.getenv('HASH_CACHE_SIZE', '0')))
+except ValueError:
+    HASH_CACHE_SIZE = 0
+
+QUESTION_WORDS = frozenset({'is', 'are', 'was', 'were', 'did', 'do', 'does', 'has', 
+                            'have', 'had','can', 'could', 'should', 'would', 'what', 
+                            'when', 'where', 'who', 'why', 'how'})
+
+PUNCT_RE = re.compile(r'[^\w\s]')
+# Runs of letters only, the same tokens word_tokenize + isalpha() kept
+WORD_RE = re.compile(r'[^\W\d_]+')
+# NewsAPI cuts article content off with a "[+1234 chars]" marker
+TRUNCATION_RE = re.compile(r'\s*\[\+\d+ chars\]$')
+# Shorter articles carry too little text to compare against
+MIN_ARTICLE_CHARS = 40
+
 # Enable CORS for all routes with specific settings
 CORS(app, resources={
     r"/*": {
@@ -24,44 +70,101 @@ CORS(app, resources={
     }
 })
 
-# Initialize NLTK data
+# Initialize NLTK data from a local directory so it is downloaded at most once.
+# Pre-bake it with: python -m nltk.downloader -d nltk_data stopwords
+NLTK_DATA_DIR = os.getenv('NLTK_DATA', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
+nltk.data.path.insert(0, NLTK_DATA_DIR)
+
 try:
-    nltk.data.find('tokenizers/punkt')
+    nltk.data.find('corpora/stopwords')
 except LookupError:
-    nltk.download('punkt')
+    nltk.download('stopwords', download_dir=NLTK_DATA_DIR)
 
+# Words dropped from claims before querying NewsAPI
 try:
-    nltk.data.find('corpora/stopwords')
+    STOP_WORDS = frozenset(nltk.corpus.stopwords.words('english')) | QUESTION_WORDS
 except LookupError:
-    nltk.download('stopwords')
+    STOP_WORDS = QUESTION_WORDS
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection that remembers its owning process and supports weak references"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pid = os.getpid()
+
+class ConnectionPool:
+    """Hands out one long-lived SQLite connection per thread"""
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        # Connections of finished threads are garbage collected and drop out
+        self.connections = weakref.WeakSet()
+        self.lock = threading.Lock()
+    
+    def get(self):
+        conn = getattr(self.local, 'conn', None)
+        # Never reuse a connection inherited across fork (gunicorn preload_app)
+        if conn is None or conn.pid != os.getpid():
+            conn = sqlite3.connect(self.path, factory=PooledConnection, check_same_thread=False, 
+                                   cached_statements=256)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA cache_size=-64000')
+            self.local.conn = conn
+            with self.lock:
+                self.connections.add(conn)
+        return conn
+    
+    def close_all(self):
+        with self.lock:
+            for conn in list(self.connections):
+                if conn.pid == os.getpid():
+                    conn.close()
+            self.connections.clear()
+        # Forget the calling thread's handle so the next get() reconnects
+        self.local.conn = None
+
+db_pool = ConnectionPool('users.db')
+atexit.register(db_pool.close_all)
 
 def init_db():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            subscription TEXT DEFAULT 'Free',
-            usage_count INTEGER DEFAULT 5,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_reset DATE DEFAULT CURRENT_DATE
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    with db_pool.get() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                subscription TEXT DEFAULT 'Free',
+                usage_count INTEGER DEFAULT 5,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_reset DATE DEFAULT CURRENT_DATE
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS article_cache (
+                key BLOB PRIMARY KEY,
+                articles TEXT NOT NULL,
+                fetched_at TIMESTAMP NOT NULL
+            )
+        ''')
+        # Daily reset filters on (subscription, last_reset); cache pruning on fetched_at
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_users_sub_reset ON users(subscription, last_reset)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_article_cache_fetched ON article_cache(fetched_at)')
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+if HASH_CACHE_SIZE > 0:
+    hash_password = functools.lru_cache(maxsize=HASH_CACHE_SIZE)(hash_password)
+
+def verify_password(password, password_hash):
+    # Constant-time comparison so response timing doesn't leak the stored hash
+    return hmac.compare_digest(hash_password(password), password_hash)
+
 def get_user(email):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('SELECT * FROM users WHERE email = ?', (email,))
-    user = c.fetchone()
-    conn.close()
+    user = db_pool.get().execute('SELECT * FROM users WHERE email = ?', (email,)).fetchone()
     
     if user:
         return {
@@ -78,88 +181,168 @@ def get_user(email):
 
 def create_user(name, email, password):
     try:
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
         password_hash = hash_password(password)
-        c.execute('INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)', 
-                 (name, email, password_hash))
-        conn.commit()
-        conn.close()
+        with db_pool.get() as conn:
+            conn.execute('INSERT INTO users (name, email, password_hash) VALUES (?, ?, ?)', 
+                         (name, email, password_hash))
         return True
     except sqlite3.IntegrityError:
         return False
 
 def update_user_subscription(email, subscription='Premium'):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('UPDATE users SET subscription = ? WHERE email = ?', 
-             (subscription, email))
-    conn.commit()
-    conn.close()
+    with db_pool.get() as conn:
+        conn.execute('UPDATE users SET subscription = ? WHERE email = ?', 
+                     (subscription, email))
 
 def update_user_usage(email, usage_count):
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
-    c.execute('UPDATE users SET usage_count = ? WHERE email = ?', 
-             (usage_count, email))
-    conn.commit()
-    conn.close()
+    with db_pool.get() as conn:
+        conn.execute('UPDATE users SET usage_count = ? WHERE email = ?', 
+                     (usage_count, email))
+
+def reset_usage_if_stale(email, free_only=False):
+    """Start a new daily quota in a single commit and return the user's current usage count"""
+    today = str(datetime.now().date())
+    sql = 'UPDATE users SET usage_count = 5, last_reset = ? WHERE email = ? AND last_reset != ?'
+    if free_only:
+        sql += " AND subscription = 'Free'"
+    # UPDATE then SELECT in one transaction (one commit) instead of RETURNING,
+    # which needs SQLite 3.35+. If another request already reset it today the
+    # UPDATE matches nothing and the SELECT returns that count.
+    with db_pool.get() as conn:
+        conn.execute(sql, (today, email, today))
+        row = conn.execute('SELECT usage_count FROM users WHERE email = ?', (email,)).fetchone()
+    return row[0] if row else None
 
 def reset_daily_usage():
-    conn = sqlite3.connect('users.db')
-    c = conn.cursor()
     today = datetime.now().date()
-    c.execute('''UPDATE users 
-                 SET usage_count = 10, last_reset = ? 
-                 WHERE subscription = 'Free' AND last_reset < ?''', 
-             (today, today))
-    conn.commit()
-    conn.close()
+    with db_pool.get() as conn:
+        conn.execute('''UPDATE users 
+                        SET usage_count = 10, last_reset = ? 
+                        WHERE subscription = 'Free' AND last_reset < ?''', 
+                     (today, today))
+
+def cache_key(query):
+    # Word order doesn't change NewsAPI relevance much, so "modi rally" == "rally modi"
+    normalized = ' '.join(sorted(set(query.lower().split())))
+    return hashlib.blake2b(normalized.encode(), digest_size=16).digest()
+
+def get_cached_articles(key):
+    row = db_pool.get().execute('SELECT articles, fetched_at FROM article_cache WHERE key = ?', (key,)).fetchone()
+    
+    if row:
+        fetched_at = datetime.fromisoformat(row[1])
+        if fetched_at > datetime.now() - ARTICLE_CACHE_TTL:
+            return json_loads(row[0]), fetched_at
+    return None
+
+def cache_articles(key, articles):
+    now = datetime.now()
+    with db_pool.get() as conn:
+        conn.execute('INSERT OR REPLACE INTO article_cache (key, articles, fetched_at) VALUES (?, ?, ?)', 
+                     (key, json.dumps(articles), now.isoformat()))
+        # Drop expired entries so the cache stays bounded by the TTL window
+        conn.execute('DELETE FROM article_cache WHERE fetched_at < ?', 
+                     ((now - ARTICLE_CACHE_TTL).isoformat(),))
+
+class TTLCache:
+    """Thread-safe in-memory LRU cache whose entries expire after a fixed time"""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if datetime.now() - stored_at > self.ttl:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, stored_at=None):
+        with self.lock:
+            self.entries[key] = (stored_at or datetime.now(), value)
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
 
 class NewsVerifier:
     def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english')
+        # Stateless hashing avoids building a vocabulary on every request
+        self.vectorizer = HashingVectorizer(stop_words='english', n_features=2**18, 
+                                            alternate_sign=False, norm=None)
+        self.analyzer = self.vectorizer.build_analyzer()
+        self.article_cache = TTLCache(ARTICLE_CACHE_SIZE, ARTICLE_CACHE_TTL)
+        # Verified claims, keyed by exact hash and by bag of TF-IDF terms
+        self.result_cache = TTLCache(RESULT_CACHE_SIZE, ARTICLE_CACHE_TTL)
+        # Reuse TCP/TLS connections to NewsAPI across requests and retry transient failures
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False)
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retry))
         
     def clean_text(self, text):
-        text = text.lower()
-        text = re.sub(r'[^\w\s]', '', text)
-        return text
+        return PUNCT_RE.sub('', text.lower())
     
     def query_keywords(self, statement):
-        try:
-            stop_words = set(nltk.corpus.stopwords.words('english'))
-        except:
-            stop_words = set()
-            
-        question_words = {'is', 'are', 'was', 'were', 'did', 'do', 'does', 'has', 
-                         'have', 'had','can', 'could', 'should', 'would', 'what', 
-                         'when', 'where', 'who', 'why', 'how'}
-        
-        try:
-            words = nltk.word_tokenize(statement.lower())
-        except:
-            words = statement.lower().split()
-            
-        filtered = [w for w in words if w.isalpha() and w not in stop_words and w not in question_words]
-        return ' '.join(filtered)
+        return ' '.join([w for w in WORD_RE.findall(statement.lower()) if w not in STOP_WORDS])
 
     def get_news_articles(self, query):
-        url = f"https://newsapi.org/v2/everything?q={query}&apiKey={NEWS_API_KEY}&pageSize=100&language=en&sortBy=relevancy"
+        if not query.strip():
+            return []
+        
+        key = cache_key(query)
+        cached = self.article_cache.get(key)
+        if cached is None:
+            stored = get_cached_articles(key)
+            if stored is not None:
+                cached, fetched_at = stored
+                # Keep the original fetch time so the entry doesn't outlive the TTL
+                self.article_cache.set(key, cached, fetched_at)
+        if cached is not None:
+            print(f"Using {len(cached)} cached articles for query '{query}'")
+            return cached
+        
+        url = "https://newsapi.org/v2/everything"
+        params = {
+            'q': query,
+            'apiKey': NEWS_API_KEY,
+            'pageSize': NEWS_PAGE_SIZE,
+            'language': 'en',
+            'sortBy': 'relevancy'
+        }
         try:
-            response = requests.get(url, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             if response.status_code == 200:
-                data = response.json()
+                data = json_loads(response.content)
                 articles = []
+                seen_titles = set()
                 for article in data.get('articles', []):
-                    title = article.get('title', '')
-                    description = article.get('description', '')
-                    content = article.get('content', '')
+                    title = article.get('title') or ''
+                    description = article.get('description') or ''
+                    content = TRUNCATION_RE.sub('', article.get('content') or '')
                     # Combine all available text
                     text = f"{title} {description} {content}".strip()
-                    if text:
-                        articles.append(text)
+                    if len(text) < MIN_ARTICLE_CHARS:
+                        continue
+                    # The same story is often syndicated by several sources; only
+                    # usable copies count, so a short first copy doesn't hide a fuller one
+                    title_key = title.lower().strip()
+                    if title_key:
+                        if title_key in seen_titles:
+                            continue
+                        seen_titles.add(title_key)
+                    articles.append(text)
                 
                 print(f"Retrieved {len(articles)} articles for query '{query}'")
+                # An empty result may just mean the story is too new; retry next time
+                if articles:
+                    cache_articles(key, articles)
+                    self.article_cache.set(key, articles)
                 return articles
             else:
                 print(f"NewsAPI Error: {response.status_code} - {response.text}")
@@ -169,9 +352,27 @@ class NewsVerifier:
             return []
     
     def verify_statement(self, statement):
+        # Exact repeats are matched by hash before any keyword extraction. Only case and
+        # whitespace are normalized: punctuation changes both the query and the TF-IDF terms.
+        exact_key = hashlib.sha256(' '.join(statement.lower().split()).encode()).digest()
+        cached = self.result_cache.get(exact_key)
+        if cached is not None:
+            print("Using cached verification")
+            return dict(cached, statement=statement)
+        
         query = self.query_keywords(statement)
         print(f"Query keywords: {query}")
         
+        # Rewordings must send the same NewsAPI query and share a non-empty
+        # bag of TF-IDF terms to reuse a verdict
+        bag = tuple(sorted(self.analyzer(statement)))
+        result_key = (cache_key(query), bag) if query and bag else None
+        if result_key is not None:
+            cached = self.result_cache.get(result_key)
+            if cached is not None:
+                print(f"Using cached verification for query '{query}'")
+                return dict(cached, statement=statement)
+        
         if not query:
             return {
                 'statement': statement,
@@ -196,11 +397,15 @@ class NewsVerifier:
         
         try:
             all_texts = [statement] + articles
-            tfidf_matrix = self.vectorizer.fit_transform(all_texts)
+            # IDF is still fitted per request so scores match plain TF-IDF
+            tfidf_matrix = TfidfTransformer().fit_transform(self.vectorizer.transform(all_texts))
             statement_vector = tfidf_matrix[0]
             article_vectors = tfidf_matrix[1:]
             
-            similarities = cosine_similarity(statement_vector, article_vectors)[0]
+            # Rows are L2-normalized, so the dot product is the cosine similarity. Only the
+            # claim's own terms contribute, so densify just those columns and do one dense gemv.
+            terms = statement_vector.indices
+            similarities = article_vectors[:, terms].toarray() @ statement_vector.data
             avg_similarity = similarities.mean()
             max_similarity = similarities.max()
             
@@ -221,21 +426,24 @@ class NewsVerifier:
                 reason = f'Little to no correlation found in {len(articles)} articles. The claim lacks credible news support.'
             
             # Get top matching sources
-            top_indices = similarities.argsort()[-5:][::-1]
-            sources = []
-            for i in top_indices:
-                if i < len(articles) and similarities[i] > 0.05:
-                    source_text = articles[i][:150] + "..."
-                    sources.append(source_text)
+            k = min(3, len(similarities))
+            top_indices = np.argpartition(-similarities, k - 1)[:k]
+            top_indices = top_indices[np.argsort(-similarities[top_indices])]
+            top_indices = top_indices[similarities[top_indices] > 0.05]
+            sources = [articles[i][:150] + "..." for i in top_indices]
             
-            return {
+            result = {
                 'statement': statement,
                 'verification': verification,
                 'confidence': round(confidence, 2),
                 'reason': reason,
-                'sources': sources[:3],
+                'sources': sources,
                 'articles_analyzed': len(articles)
             }
+            self.result_cache.set(exact_key, result)
+            if result_key is not None:
+                self.result_cache.set(result_key, result)
+            return result
             
         except Exception as e:
             print(f"Error in verification: {e}")
@@ -255,11 +463,11 @@ verifier = NewsVerifier()
 # Routes for serving HTML files
 @app.route('/')
 def home():
-    return send_from_directory('.', 'home.html')
+    return send_from_directory('.', 'home.html', max_age=STATIC_MAX_AGE)
 
 @app.route('/index.html')
 def index():
-    return send_from_directory('.', 'index.html')
+    return send_from_directory('.', 'index.html', max_age=STATIC_MAX_AGE)
 
 @app.route('/verify', methods=['POST'])
 def verify():
@@ -280,15 +488,10 @@ def verify():
             user = get_user(user_email)
             if user:
                 # Reset usage if it's a new day
-                today = str(datetime.now().date())
-                if user['last_reset'] != today:
-                    update_user_usage(user_email, 5)
-                    conn = sqlite3.connect('users.db')
-                    c = conn.cursor()
-                    c.execute('UPDATE users SET last_reset = ? WHERE email = ?', (today, user_email))
-                    conn.commit()
-                    conn.close()
-                    user['usage_count'] = 5
+                if user['last_reset'] != str(datetime.now().date()):
+                    usage_count = reset_usage_if_stale(user_email)
+                    if usage_count is not None:
+                        user['usage_count'] = usage_count
                 
                 # Check limits for free users
                 if user['subscription'] == 'Free' and user['usage_count'] <= 0:
@@ -304,7 +507,10 @@ def verify():
                 new_count = max(0, user['usage_count'] - 1)
                 update_user_usage(user_email, new_count)
         
-        return jsonify(result)
+        response = jsonify(result)
+        # Verdicts depend on live news and per-user quota, never reuse them
+        response.headers['Cache-Control'] = 'no-store'
+        return response
         
     except Exception as e:
         print(f"Error in verify endpoint: {e}")
@@ -324,19 +530,14 @@ def login():
         if not user:
             return jsonify({'success': False, 'message': 'Invalid email or password'})
         
-        if user['password_hash'] != hash_password(password):
+        if not verify_password(password, user['password_hash']):
             return jsonify({'success': False, 'message': 'Invalid email or password'})
         
         # Reset daily usage if it's a new day
-        today = str(datetime.now().date())
-        if user['last_reset'] != today and user['subscription'] == 'Free':
-            update_user_usage(email, 5)
-            conn = sqlite3.connect('users.db')
-            c = conn.cursor()
-            c.execute('UPDATE users SET last_reset = ? WHERE email = ?', (today, email))
-            conn.commit()
-            conn.close()
-            user['usage_count'] = 5
+        if user['last_reset'] != str(datetime.now().date()) and user['subscription'] == 'Free':
+            usage_count = reset_usage_if_stale(email, free_only=True)
+            if usage_count is not None:
+                user['usage_count'] = usage_count
         
         return jsonify({
             'success': True,
@@ -419,4 +620,5 @@ if __name__ == '__main__':
     print("Server running on http://localhost:8000")
     print("Home page: http://localhost:8000")
     print("Main app: http://localhost:8000/index.html")
-    app.run(debug=True, port=8000, host='0.0.0.0')
+    # Development server only; use gunicorn.conf.py in production
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', port=8000, host='0.0.0.0')
@@ -1,54 +1,103 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
+import re
+import sqlite3
+import threading
 from datetime import datetime
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# File path for storing user data
-USERS_FILE = "users.txt"
-HISTORY_FILE = "history.txt"
-
-def read_users():
-    """Read users from the text file"""
-    users = []
-    if os.path.exists(USERS_FILE):
-        with open(USERS_FILE, "r") as file:
-            for line in file:
-                if line.strip():
-                    parts = line.strip().split(" | ")
-                    user = {}
-                    for part in parts:
-                        key, value = part.split(": ", 1)
-                        user[key.lower()] = value
-                    users.append(user)
-    return users
+# SQLite database for storing user data and search history
+DB_FILE = "app.db"
+HISTORY_LIMIT = 100
+
+db = sqlite3.connect(DB_FILE, check_same_thread=False)
+db.row_factory = sqlite3.Row
+db_lock = threading.Lock()
+
+# Flat files used before the SQLite store, imported once on startup
+LEGACY_USERS_FILE = "users.txt"
+LEGACY_HISTORY_FILE = "history.txt"
+
+_USER_RE = re.compile(r"^ID: (?P<id>[^|]+) \| Name: (?P<name>[^|]+) \| Email: (?P<email>[^|]+) \| Created: (?P<created>.+)$")
+_HIST_RE = re.compile(r"^User: (?P<email>[^|]+) \| Date: (?P<date>[^|]+) \| Search: (?P<search>.*) \| Credibility: (?P<credibility>[^|\n]*)$")
+
+def init_db():
+    """Create tables and indexes if they don't exist"""
+    with db_lock, db:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                email TEXT UNIQUE NOT NULL,
+                created TEXT
+            )
+        """)
+        db.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL,
+                date TEXT,
+                search TEXT,
+                credibility TEXT
+            )
+        """)
+        db.execute("CREATE INDEX IF NOT EXISTS idx_history_email ON history(email)")
+
+def find_user_by_email(email):
+    """Look up a single user by email"""
+    with db_lock:
+        row = db.execute("SELECT id, name, email, created FROM users WHERE email = ?", (email,)).fetchone()
+    return dict(row) if row else None
 
 def write_user(user_data):
-    """Write a new user to the text file"""
-    with open(USERS_FILE, "a") as file:
-        file.write(f"ID: {user_data['id']} | Name: {user_data['name']} | Email: {user_data['email']} | Created: {user_data['created']}\n")
+    """Insert a new user and return its ID, or None if the email is taken"""
+    try:
+        with db_lock, db:
+            cursor = db.execute("INSERT INTO users (name, email, created) VALUES (?, ?, ?)",
+                                (user_data['name'], user_data['email'], user_data['created']))
+        return cursor.lastrowid
+    except sqlite3.IntegrityError:
+        return None
 
 def add_to_history(search_data):
-    """Add a search to the history file"""
-    with open(HISTORY_FILE, "a") as file:
-        file.write(f"User: {search_data['email']} | Date: {search_data['date']} | Search: {search_data['search']} | Credibility: {search_data['credibility']}\n")
+    """Add a search to the history table"""
+    with db_lock, db:
+        db.execute("INSERT INTO history (email, date, search, credibility) VALUES (?, ?, ?, ?)",
+                   (search_data['email'], search_data['date'], search_data['search'], search_data['credibility']))
 
 def get_user_history(email):
-    """Get search history for a specific user"""
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r") as file:
-            for line in file:
-                if line.strip() and f"User: {email}" in line:
-                    parts = line.strip().split(" | ")
-                    history_item = {}
-                    for part in parts:
-                        key, value = part.split(": ", 1)
-                        history_item[key.lower()] = value
-                    history.append(history_item)
-    return history
+    """Get the most recent searches for a specific user, newest first"""
+    with db_lock:
+        # idx_history_email also orders by rowid, so this is an index range scan
+        rows = db.execute("SELECT email AS user, date, search, credibility FROM history WHERE email = ? ORDER BY id DESC LIMIT ?",
+                          (email, HISTORY_LIMIT)).fetchall()
+    return [dict(row) for row in rows]
+
+def parse_legacy_file(path, pattern):
+    """Parse the records of a legacy text file with a precompiled regex"""
+    with open(path, "r") as file:
+        return [m.groupdict() for m in map(pattern.match, file) if m]
+
+def import_legacy_files():
+    """Move users and history from the old text files into the database"""
+    if os.path.exists(LEGACY_USERS_FILE):
+        users = parse_legacy_file(LEGACY_USERS_FILE, _USER_RE)
+        with db_lock, db:
+            db.executemany("INSERT OR IGNORE INTO users (name, email, created) VALUES (:name, :email, :created)", users)
+        os.replace(LEGACY_USERS_FILE, LEGACY_USERS_FILE + ".migrated")
+    
+    if os.path.exists(LEGACY_HISTORY_FILE):
+        history = parse_legacy_file(LEGACY_HISTORY_FILE, _HIST_RE)
+        with db_lock, db:
+            db.executemany("INSERT INTO history (email, date, search, credibility) VALUES (:email, :date, :search, :credibility)", history)
+        os.replace(LEGACY_HISTORY_FILE, LEGACY_HISTORY_FILE + ".migrated")
+
+init_db()
+import_legacy_files()
 
 @app.route('/register', methods=['POST'])
 def register():
@@ -58,25 +107,18 @@ def register():
         email = data.get('email')
         password = data.get('password')
         
-        # Read existing users
-        users = read_users()
-        
-        # Check if email already exists
-        for user in users:
-            if user['email'] == email:
-                return jsonify({'error': 'Email already registered'}), 400
-        
         # Create new user
-        new_id = len(users) + 1
         new_user = {
-            'id': new_id,
             'name': name,
             'email': email,
             'created': datetime.now().strftime("%Y-%m-%d")
         }
         
-        # Save user to file
-        write_user(new_user)
+        # Save user; the UNIQUE email constraint rejects duplicates
+        new_id = write_user(new_user)
+        if new_id is None:
+            return jsonify({'error': 'Email already registered'}), 400
+        new_user['id'] = new_id
         
         return jsonify({'message': 'User registered successfully', 'user': new_user}), 201
         
@@ -90,14 +132,11 @@ def login():
         email = data.get('email')
         password = data.get('password')
         
-        # Read users from file
-        users = read_users()
-        
         # Find user with matching email
-        for user in users:
-            if user['email'] == email:
-                # In a real app, you would verify the password here
-                return jsonify({'message': 'Login successful', 'user': user}), 200
+        user = find_user_by_email(email)
+        if user:
+            # In a real app, you would verify the password here
+            return jsonify({'message': 'Login successful', 'user': user}), 200
         
         return jsonify({'error': 'Invalid credentials'}), 401
         
@@ -175,11 +214,4 @@ def check_news():
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    # Create files if they don't exist
-    if not os.path.exists(USERS_FILE):
-        open(USERS_FILE, 'w').close()
-    
-    if not os.path.exists(HISTORY_FILE):
-        open(HISTORY_FILE, 'w').close()
-    
     app.run(debug=True, port=5000)